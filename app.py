@@ -1,12 +1,69 @@
-import sys, glob, os
+import sys, glob, os, argparse
 from PySide2 import QtCore, QtGui, QtWidgets
 from PySide2.QtWidgets import *
-from PySide2.QtCore import Qt, QDate
+from PySide2.QtCore import Qt, QDate, QThread, Signal
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from datetime import datetime
-from plotter import DataHandler, page_from_csv
+from plotter import DataHandler, page_from_csv, check_animation_name, export_animation
 import data_prep
 
+class RefreshThread(QThread):
+    ''' Downloads the newest data in the background, so that the application
+    can be used with the tables already saved in the meantime. '''
+    refreshed = Signal(list) # emits file names of the refreshed tables
+    failed = Signal(str) # emits an error message
+    close_timeout = (data_prep.url_timeout + 5) * 1000 # ms to wait for a stopped download
+
+    def __init__(self, compression=None):
+        '''
+        Params
+        string `compression`: (optional) "gzip" or "zstd" to compress the tables
+        '''
+        super().__init__()
+        self.compression = compression
+
+    def run(self):
+        '''
+        Runs data_prep.prepare() on this thread, then signals the result.
+        Nothing is signalled if the refresh is interrupted.
+        '''
+        try:
+            finished = data_prep.prepare(self.compression, self.isInterruptionRequested)
+        except Exception as error:
+            self.failed.emit(str(error))
+            return
+        if finished:
+            self.refreshed.emit(glob.glob("./tables/*.csv*"))
+
+
+class ExportThread(QThread):
+    ''' Draws and saves an animation in the background, so that the
+    application stays usable while frames are rendered. '''
+    saved = Signal(str) # emits the saved file name
+    failed = Signal(str) # emits an error message
+
+    def __init__(self, figure_data, file_name):
+        '''
+        Params
+        bytes `figure_data`: pickled figure, from DataPage.plot_snapshot
+        string `file_name`: .gif or .mp4 file path, or PNG frame file pattern
+        '''
+        super().__init__()
+        self.figure_data = figure_data
+        self.file_name = file_name
+
+    def run(self):
+        '''
+        Runs plotter.export_animation() on this thread, then signals the result.
+        '''
+        try:
+            export_animation(self.figure_data, self.file_name)
+        except Exception as error:
+            self.failed.emit(str(error))
+            return
+        self.saved.emit(self.file_name)
+
+
 class MainWindow(QMainWindow):
     ''' The main application window, which handles user interaction,
     manages the plot tabs, and manages the overall controls. '''
@@ -74,17 +131,39 @@ class MainWindow(QMainWindow):
 
         # set up location chooser
         self.location_drop = QComboBox()
-        self.location_drop.addItems(["[All]", "[None]"])
+        self.location_drop.addItems(["[All]", "[None]", "[Top 10]"])
         self.location_drop.activated[str].connect(self.add_location)
         location_label = QLabel("Location:")
         controls_l.addWidget(location_label, 0, 2, Qt.AlignTop)
         controls_l.addWidget(self.location_drop, 0, 3, Qt.AlignTop)
+        # set up ordering of locations, by name or by a page summary column
+        self.sort_options = {
+            "Name": None,
+            "Latest value": "latest",
+            "Peak value": "peak",
+            "7-day growth": "growth",
+            "Per capita": "per_capita",
+            "7-day change per capita": "weekly_per_capita",
+        }
+        self.sort_drop = QComboBox()
+        self.sort_drop.addItems(list(self.sort_options))
+        self.sort_drop.activated[str].connect(self.update_location_drop)
+        sort_label = QLabel("Order by:")
+        controls_l.addWidget(sort_label, 1, 2, Qt.AlignTop)
+        controls_l.addWidget(self.sort_drop, 1, 3, Qt.AlignTop)
         # set up list of locations
         self.locations_list_w = QListWidget()
         self.locations_list_w.itemClicked.connect(self.remove_location)
         location_remove_label = QLabel("Click items to remove.")
-        controls_l.addWidget(location_remove_label, 1, 2, 1, 2, Qt.AlignTop)
-        controls_l.addWidget(self.locations_list_w, 2, 2, 11, 2, Qt.AlignTop)
+        controls_l.addWidget(location_remove_label, 2, 2, 1, 2, Qt.AlignTop)
+        controls_l.addWidget(self.locations_list_w, 3, 2, 10, 2, Qt.AlignTop)
+        # set up highlighting, for picking out locations among many
+        self.highlight_drop = QComboBox()
+        self.highlight_drop.addItems(["[None]"])
+        self.highlight_drop.activated[str].connect(self.highlight_location)
+        highlight_label = QLabel("Highlight:")
+        controls_l.addWidget(highlight_label, 12, 0, Qt.AlignTop)
+        controls_l.addWidget(self.highlight_drop, 12, 1, Qt.AlignTop)
 
         # add buttons to save plots & load data
         buttons_l = QHBoxLayout()
@@ -118,6 +197,8 @@ Accessed from <a href="https://github.com/CSSEGISandData/COVID-19">https://githu
         controls_l.addWidget(about_label, 14, 0, 1, 4)
 
         self.setCentralWidget(main_w)
+        self.export_thread = None
+        self.refresh_thread = None
         
 
     def load_pages(self, file_list):
@@ -136,29 +217,104 @@ Accessed from <a href="https://github.com/CSSEGISandData/COVID-19">https://githu
         if isinstance(file_list, str):
             file_list = [file_list]
 
-        new_pages = []
-        for file_name in file_list:
-            page = page_from_csv(file_name)
-            self.data_handler.add_page(page)
-            new_pages.append(page)
+        new_pages = [page_from_csv(file_name) for file_name in file_list]
+        self.data_handler.add_pages(new_pages)
         
         for data_page in new_pages:
             page_canvas = FigureCanvas(data_page.figure)
             self.plot_w.addTab(page_canvas, data_page.title)
             self.canvas_pages.append(page_canvas)
 
-        all_locations = self.data_handler.headers
-        new_locations = [name for name in all_locations if name not in self.location_names]
-        self.location_names.extend(new_locations)
-        self.location_drop.addItems(new_locations)
-
         if len(self.canvas_pages) > 0 and self.current_page_index is None:
             # if pages successfully loaded, remove empty tab
             self.plot_w.removeTab(0)
             self.current_page_index = self.plot_w.currentIndex()
 
+        self.update_locations()
         self.on_update()
 
+    def reload_pages(self, file_list):
+        '''
+        Swaps refreshed data into the pages loaded from a list of .csv file
+        paths, matching them to existing pages by title. The location
+        selection, toggles and start date are kept. Files for tables not
+        loaded yet are added as new pages.
+
+        Params
+        string list `file_list`: list of file paths
+        '''
+        titles = self.data_handler.get_page_titles()
+        replacements = []
+        new_files = []
+        for file_name in file_list:
+            page = page_from_csv(file_name)
+            if page.title in titles:
+                replacements.append((self.data_handler.pages[titles.index(page.title)], page.data))
+            else:
+                new_files.append(file_name)
+        if len(replacements) > 0:
+            self.data_handler.replace_pages(replacements)
+
+        if len(new_files) > 0 and len(titles) > 0:
+            # adding pages selects every location, so put the user's choices back
+            active_headers = self.data_handler.active_headers[:]
+            highlighted_headers = self.data_handler.highlighted_headers[:]
+            start_date = self.data_handler.start_date
+            self.load_pages(new_files)
+            self.data_handler.active_headers = active_headers
+            self.data_handler.highlighted_headers = highlighted_headers
+            self.data_handler.start_date = max(start_date, self.data_handler.min_date)
+            self.on_update()
+        elif len(new_files) > 0:
+            self.load_pages(new_files)
+        else:
+            self.update_locations()
+            self.on_update()
+
+    def refresh_data(self, compression=None):
+        '''
+        Starts downloading the newest data in the background. When it is
+        done, the refreshed tables are swapped into the open pages.
+
+        Params
+        string `compression`: (optional) "gzip" or "zstd" to compress the tables
+        '''
+        self.statusBar().showMessage("Downloading the newest data...")
+        self.refresh_thread = RefreshThread(compression)
+        self.refresh_thread.refreshed.connect(self.on_refreshed)
+        self.refresh_thread.failed.connect(self.on_refresh_failed)
+        self.refresh_thread.start()
+
+    def on_refreshed(self, file_list):
+        '''
+        Loads refreshed tables once the background download is done.
+
+        Params
+        string list `file_list`: list of file paths
+        '''
+        self.reload_pages(file_list)
+        self.statusBar().showMessage("Data updated", 5000)
+
+    def on_refresh_failed(self, message):
+        '''
+        Reports that the background download failed. The tables already
+        loaded stay in use.
+
+        Params
+        string `message`: description of the error
+        '''
+        self.statusBar().showMessage("Could not download the newest data: " + message)
+
+    def update_locations(self):
+        '''
+        Adds any locations the DataHandler has gained to the list of location
+        names, and refills the location drop-downs.
+        '''
+        all_locations = self.data_handler.headers
+        new_locations = [name for name in all_locations if name not in self.location_names]
+        self.location_names.extend(new_locations)
+        self.update_location_drop()
+
     def change_page(self, page_index):
         '''
         Changes the current page in order to display a different table of data.
@@ -186,6 +342,8 @@ Accessed from <a href="https://github.com/CSSEGISandData/COVID-19">https://githu
                 self.toggle_per_capita(disabled=False)
             elif not self.current_page.per_capita_allowed:
                 self.toggle_per_capita(0, disabled=True)
+
+            self.update_location_drop()
             
         self.on_update()
 
@@ -195,7 +353,7 @@ Accessed from <a href="https://github.com/CSSEGISandData/COVID-19">https://githu
         button is clicked.
         '''
         options = QFileDialog.Options()
-        file_names, _ = QFileDialog.getOpenFileNames(self,"Open File","","CSV files (*.csv *.CSV)", options=options)
+        file_names, _ = QFileDialog.getOpenFileNames(self,"Open File","","CSV files (*.csv *.CSV *.csv.gz *.csv.zst)", options=options)
         if len(file_names) > 0:
             self.load_pages(file_names)
 
@@ -211,13 +369,84 @@ Accessed from <a href="https://github.com/CSSEGISandData/COVID-19">https://githu
     def save_image(self):
         '''
         Opens a file saving dialog and saves the current plot to a chosen
-        image file.
+        image file. If a .gif or .mp4 file or the "animation frames" type is
+        chosen, an animation of the plot over time is saved in the background
+        instead, with progress and errors shown in the status bar.
         '''
         if self.current_page is not None:
             options = QFileDialog.Options()
-            file_name, _ = QFileDialog.getSaveFileName(self,"Save File","","Image files (*.jpeg *.jpg *.png *.JPEG *.JPG *.PNG)", options=options)
-            if file_name:
+            frames_filter = "Animation frames (*.png *.PNG)"
+            file_name, file_filter = QFileDialog.getSaveFileName(self,"Save File","","Image files (*.jpeg *.jpg *.png *.JPEG *.JPG *.PNG);;Animations (*.gif *.mp4 *.GIF *.MP4);;" + frames_filter, options=options)
+            if not file_name:
+                return
+            if file_filter == frames_filter:
+                # number the frames after the chosen name, e.g. cases_0000.png
+                file_name = os.path.splitext(file_name.replace("%", "%%"))[0] + "_%04d.png"
+            elif os.path.splitext(file_name)[1].lower() not in (".gif", ".mp4"):
                 self.current_page.save(file_name)
+                return
+
+            try:
+                check_animation_name(file_name)
+            except (RuntimeError, ValueError) as error:
+                self.statusBar().showMessage("Could not save animation: " + str(error))
+                return
+            if self.export_thread is not None and self.export_thread.isRunning():
+                self.statusBar().showMessage("An animation is already being saved")
+                return
+            figure_data = self.current_page.plot_snapshot()
+            self.canvas_pages[self.current_page_index].draw()
+            self.statusBar().showMessage("Saving animation...")
+            self.export_thread = ExportThread(figure_data, file_name)
+            self.export_thread.saved.connect(lambda name: self.statusBar().showMessage("Saved " + name, 5000))
+            self.export_thread.failed.connect(lambda message: self.statusBar().showMessage("Could not save animation: " + message))
+            self.export_thread.start()
+
+    def closeEvent(self, event):
+        '''
+        Stops any download still running and waits for any animation still
+        being saved before the window closes, since Qt aborts if a running
+        thread is destroyed. The download stops before its next request, and
+        waiting for it is limited by the downloads' own timeout.
+
+        Params
+        QCloseEvent `event`: the close event
+        '''
+        if self.refresh_thread is not None and self.refresh_thread.isRunning():
+            self.statusBar().showMessage("Stopping the data refresh before closing...")
+            self.refresh_thread.requestInterruption()
+            self.refresh_thread.wait(RefreshThread.close_timeout)
+        if self.export_thread is not None and self.export_thread.isRunning():
+            self.statusBar().showMessage("Finishing the animation before closing...")
+            self.export_thread.wait()
+        super().closeEvent(event)
+
+    def ranked_locations(self):
+        '''
+        Orders all location names by the option chosen in the "order by"
+        drop-down, using the current page's summary. Locations missing from
+        the current page are listed last, by name.
+
+        Returns
+        string list: ordered location names
+        '''
+        column = self.sort_options[self.sort_drop.currentText()]
+        if column is None or self.current_page is None:
+            return sorted(self.location_names)
+        ranked = self.current_page.rank_locations(column)
+        return ranked + sorted(name for name in self.location_names if name not in self.current_page.headers)
+
+    def update_location_drop(self, *args):
+        '''
+        Refills the location drop-down in the order chosen in the "order by"
+        drop-down.
+        '''
+        self.location_drop.clear()
+        self.location_drop.addItems(["[All]", "[None]", "[Top 10]"])
+        self.location_drop.addItems(self.ranked_locations())
+        self.highlight_drop.clear()
+        self.highlight_drop.addItems(["[None]"])
+        self.highlight_drop.addItems(self.ranked_locations())
 
     def add_location(self, location_name):
         '''
@@ -234,6 +463,11 @@ Accessed from <a href="https://github.com/CSSEGISandData/COVID-19">https://githu
             self.locations_list_w.clear() # no duplicates
             self.locations_list_w.addItems(self.location_names)
             self.data_handler.active_headers = self.location_names[:] # make a copy
+        elif location_name == "[Top 10]":
+            top_locations = self.ranked_locations()[:10]
+            self.locations_list_w.clear()
+            self.locations_list_w.addItems(top_locations)
+            self.data_handler.active_headers = top_locations
         elif location_name not in self.data_handler.active_headers:
             location_item = QListWidgetItem(location_name)
             self.locations_list_w.addItem(location_item)
@@ -246,6 +480,23 @@ Accessed from <a href="https://github.com/CSSEGISandData/COVID-19">https://githu
 
         self.on_update()
 
+    def highlight_location(self, location_name):
+        '''
+        Toggles whether a location selected from the highlight drop-down is
+        drawn emphasized in the plot.
+
+        Params
+        string `location_name`: name of a location to highlight, or "[None]"
+        '''
+        if location_name == "[None]":
+            self.data_handler.highlighted_headers = []
+        elif location_name in self.data_handler.highlighted_headers:
+            self.data_handler.highlighted_headers.remove(location_name)
+        else:
+            self.data_handler.highlighted_headers.append(location_name)
+
+        self.on_update()
+
     def remove_location(self, item):
         '''
         Removes a clicked location from the list of locations displayed in the
@@ -375,32 +626,21 @@ Accessed from <a href="https://github.com/CSSEGISandData/COVID-19">https://githu
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Plot COVID-19 data tables.")
+    parser.add_argument("--offline", action="store_true", help="don't download the newest data")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], help="compress downloaded tables")
+    args = parser.parse_args()
+
     # Look for tables in here
-    files = glob.glob("./tables/*.csv")
-
-    if len(files) == 0:
-        response = input('''    No files were found in the expected directory, ./tables.
-    Would you like to download data from online? [Y]
-    If not, you can import data from another directory. [N]
-    Enter y/[N] ''')
-        if (len(response) > 0) and (response.lower()[0] == 'y'):
-            data_prep.prepare()
-            files = glob.glob("./tables/*.csv")
-    else:
-        response = input('''    Files were found in the expected directory, ./tables.
-    However, more recent updated data may be available.
-    Would you like to download the newest data from online? [Y]
-    If not, the current data will be used. [N]
-    Enter y/[N] ''')
-        if (len(response) > 0) and (response.lower()[0] == 'y'):
-            data_prep.prepare()
-            files = glob.glob("./tables/*.csv")
+    files = glob.glob("./tables/*.csv*")
 
     app = QApplication([]) # create the application
     window = MainWindow("COVID-19 Data") # create the main window
 
-    # load data from files
+    # load data from files, then fetch the newest data while the window is open
     window.load_pages(files)
+    if not args.offline:
+        window.refresh_data(args.compression)
 
     window.show() # display the window
     sys.exit(app.exec_()) # run the main event loop
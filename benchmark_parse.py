@@ -0,0 +1,131 @@
+'''
+Compares parsing per-state daily .json files from covidtracking.com with
+pandas (how data_prep.add_state used to do it) and with
+data_prep.parse_state_json, for time and peak memory per state.
+
+The covidtracking.com API no longer serves data, so fixture files in its
+format can be built from the saved tables, then benchmarked:
+    python benchmark_parse.py --build fixtures/
+    python benchmark_parse.py fixtures/
+Any directory of recorded daily .json files can be benchmarked the same way.
+'''
+
+import glob, io, json, os, sys, time, tracemalloc
+import numpy as np
+import pandas as pd
+import data_prep
+from plotter import page_from_csv
+
+# the other fields of a covidtracking.com daily record, with typical values
+other_fields = {
+    "negative": 0, "pending": None, "hospitalizedCurrently": 0, "hospitalizedCumulative": 0,
+    "inIcuCurrently": None, "inIcuCumulative": None, "onVentilatorCurrently": None,
+    "onVentilatorCumulative": None, "recovered": 0, "dataQualityGrade": "A",
+    "lastUpdateEt": "5/21/2020 00:00", "dateModified": "2020-05-21T00:00:00Z",
+    "checkTimeEt": "05/20 20:00", "death": 0, "hospitalized": 0,
+    "dateChecked": "2020-05-21T00:00:00Z", "fips": "00", "positiveIncrease": 0,
+    "negativeIncrease": 0, "total": 0, "totalTestResultsIncrease": 0, "posNeg": 0,
+    "deathIncrease": 0, "hospitalizedIncrease": 0,
+    "hash": "0123456789abcdef0123456789abcdef01234567", "commercialScore": 0,
+    "negativeRegularScore": 0, "negativeScore": 0, "positiveScore": 0, "score": 0, "grade": "",
+}
+
+
+def parse_with_pandas(text):
+    '''
+    Parses a daily .json file the way add_state did before parse_state_json.
+
+    Params
+    bytes `text`: contents of a daily .json file
+
+    Returns
+    Series `positive`: positive test results by date
+    Series `total_tests`: total test results by date
+    '''
+    data = pd.read_json(io.BytesIO(text))
+    data["date"] = pd.to_datetime(data["date"], format='%Y%m%d')
+    data = data.set_index("date")
+    return pd.Series(data = data["positive"]), pd.Series(data = data["totalTestResults"])
+
+def parse_lean(text):
+    '''
+    Parses a daily .json file the way add_state does now.
+
+    Params
+    bytes `text`: contents of a daily .json file
+
+    Returns
+    Series `positive`: positive test results by date
+    Series `total_tests`: total test results by date
+    '''
+    dates, positive, total_tests = data_prep.parse_state_json(io.BytesIO(text))
+    return pd.Series(data = positive, index = dates), pd.Series(data = total_tests, index = dates)
+
+def measure(parse, texts, repeats=5):
+    '''
+    Times a parsing function over every file, and measures its peak memory
+    use on the largest one.
+
+    Params
+    function `parse`: parsing function taking file contents
+    bytes list `texts`: contents of each file
+    int `repeats`: number of times to parse all files; the fastest is kept
+
+    Returns
+    float: mean seconds per file
+    int: peak bytes allocated while parsing the largest file
+    '''
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            parse(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    parse(max(texts, key=len))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best / len(texts), peak
+
+def build(directory):
+    '''
+    Writes a daily .json file for every state in covidtracking.com's format,
+    newest date first, using the saved test and positivity tables for the
+    date, totalTestResults and positive fields.
+
+    Params
+    string `directory`: directory to save files in
+    '''
+    os.makedirs(directory, exist_ok=True)
+    tests = page_from_csv("tables/Tests_US.csv").data
+    ratios = page_from_csv("tables/Positivity_Ratio_US.csv").data
+    names = [name.strip() for name in open("state_info/state_names.txt").readlines()]
+    abbrs = [abbr.strip() for abbr in open("state_info/state_abbrs.txt").readlines()]
+    for name, abbr in zip(names, abbrs):
+        if name not in tests.columns:
+            continue
+        total_tests = tests[name].dropna()
+        positive = (total_tests * ratios[name].reindex(total_tests.index)).round()
+        records = []
+        for date in total_tests.index[::-1]:
+            record = {"date": int(date.strftime("%Y%m%d")), "state": abbr,
+                "positive": None if np.isnan(positive[date]) else int(positive[date]),
+                "totalTestResults": int(total_tests[date])}
+            record.update(other_fields)
+            records.append(record)
+        with open(os.path.join(directory, abbr.lower() + ".json"), 'w') as f:
+            json.dump(records, f, indent=2)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--build":
+        build(sys.argv[2])
+        sys.exit()
+
+    texts = [open(file_name, 'rb').read() for file_name in sorted(glob.glob(os.path.join(sys.argv[1], "*.json")))]
+    print("%i files" % len(texts))
+    for name, parse in [("pandas", parse_with_pandas), ("parse_state_json", parse_lean)]:
+        seconds, peak = measure(parse, texts)
+        print("%-18s %8.2f ms per state %10.1f KB peak" % (name, seconds * 1000, peak / 1024))
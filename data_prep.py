@@ -14,9 +14,111 @@ Testing and populations:
 -------------------------------------------------------------------------------
 '''
 
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import codecs
+from urllib.request import urlopen
+import gzip
+import json
+import os
+import re
+import numpy as np
 import pandas as pd
 
 
+separators = re.compile(r"[\s,]*") # between records of a .json array
+url_timeout = 30 # seconds to wait on a stalled server before giving up
+
+def read_url_csv(url, **kwargs):
+    '''
+    Reads a .csv file from a URL into a DataFrame, giving up if the server
+    stops responding for `url_timeout` seconds.
+
+    Params
+    string `url`: address of the .csv file
+    keyword arguments: passed on to pandas.read_csv
+
+    Returns
+    DataFrame: the table read
+    '''
+    with urlopen(url, timeout=url_timeout) as response:
+        return pd.read_csv(response, **kwargs)
+
+def parse_state_json(stream, chunk_size=8192):
+    '''
+    Parses a covidtracking.com daily .json array for one state, keeping only
+    the date, positive tests and total tests of each record. The file is
+    read in chunks, and records are decoded one at a time into preallocated
+    arrays (grown as needed), rather than building a table of every field.
+
+    Params
+    binary file `stream`: daily .json file or response to read from
+    int `chunk_size`: number of bytes to read at a time
+
+    Returns
+    DatetimeIndex `dates`: date of each record
+    float array `positive`: positive test results, NaN where not reported
+    float array `total_tests`: total test results, NaN where not reported
+    '''
+    capacity = 512
+    yyyymmdd = np.zeros(capacity, dtype=np.int64)
+    positive = np.full(capacity, np.nan)
+    total_tests = np.full(capacity, np.nan)
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = None # position in buffer; None until the array's opening bracket is found
+    i = 0
+    done = False
+    while not done:
+        chunk = stream.read(chunk_size)
+        at_end = len(chunk) == 0
+        buffer = buffer[pos or 0:] + text_decoder.decode(chunk, final=at_end)
+        if pos is None:
+            start = buffer.find('[')
+            if start < 0:
+                if at_end:
+                    raise ValueError("No .json array found")
+                continue
+            buffer = buffer[start + 1:]
+        pos = 0
+
+        while True:
+            pos = separators.match(buffer, pos).end()
+            if pos == len(buffer):
+                break # wait for the next chunk
+            if buffer[pos] == ']':
+                done = True
+                break
+            try:
+                record, pos_after = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if at_end:
+                    raise
+                break # record continues in the next chunk
+            pos = pos_after
+
+            if i == capacity:
+                yyyymmdd = np.concatenate([yyyymmdd, np.zeros(capacity, dtype=np.int64)])
+                positive = np.concatenate([positive, np.full(capacity, np.nan)])
+                total_tests = np.concatenate([total_tests, np.full(capacity, np.nan)])
+                capacity *= 2
+            yyyymmdd[i] = record["date"]
+            if record.get("positive") is not None:
+                positive[i] = record["positive"]
+            if record.get("totalTestResults") is not None:
+                total_tests[i] = record["totalTestResults"]
+            i += 1
+
+        if at_end and not done:
+            raise ValueError("Unexpected end of .json array")
+
+    # YYYYMMDD integers to dates: whole months since 1970, then days
+    months = (yyyymmdd[:i] // 10000 - 1970) * 12 + (yyyymmdd[:i] // 100 % 100 - 1)
+    dates = months.astype("datetime64[M]").astype("datetime64[D]") + (yyyymmdd[:i] % 100 - 1)
+    return pd.DatetimeIndex(dates), positive[:i], total_tests[:i]
+
 def add_state(total_tests_frame, pos_ratios_frame, name, abbr):
     '''
     Adds data for a single state or territory to a table accumulating all state
@@ -35,11 +137,10 @@ def add_state(total_tests_frame, pos_ratios_frame, name, abbr):
     DataFrame `pos_ratios_frame`: copy of input with additional column added
     '''
     data_url = f"https://covidtracking.com/api/v1/states/%s/daily.json" % abbr.lower()
-    data = pd.read_json(data_url)
-    data["date"] = pd.to_datetime(data["date"], format='%Y%m%d')
-    data = data.set_index("date")
-    positive = pd.Series(data = data["positive"])
-    total_tests = pd.Series(data = data["totalTestResults"])
+    with urlopen(data_url, timeout=url_timeout) as response:
+        dates, positive, total_tests = parse_state_json(response)
+    positive = pd.Series(data = positive, index = dates)
+    total_tests = pd.Series(data = total_tests, index = dates)
     pos_ratios = positive.div(total_tests)
 
     if len(total_tests_frame.index) < len(total_tests.index):
@@ -53,34 +154,103 @@ def add_state(total_tests_frame, pos_ratios_frame, name, abbr):
 
     return total_tests_frame, pos_ratios_frame
 
+def open_table(file_name, mode='r'):
+    '''
+    Opens a table file as text, decompressing or compressing it according to
+    its extension: .gz files use gzip and .zst files use zstd (which requires
+    the zstandard module). Any other file is opened as plain text.
+
+    Params
+    string `file_name`: file path of table
+    string `mode`: 'r' to read or 'w' to write
+
+    Returns
+    file object: open text file
+    '''
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == ".gz":
+        return gzip.open(file_name, mode + 't', newline='')
+    elif extension == ".zst":
+        import zstandard # only needed for zstd tables
+        return zstandard.open(file_name, mode + 't', newline='')
+    return open(file_name, mode, newline='')
+
 def save_csv_commented(file_name, dataframe, settings=None):
     '''
     Writes a DataFrame to the given file name with comments added at the top
     according to the contents of the settings dictionary.
+    The table is written to a temporary file, then renamed over `file_name`,
+    so an interrupted write never leaves a partial table.
+    File names ending in .gz or .zst are compressed (see open_table).
 
     Params
     string `file_name`: file path of .csv file to write to
     DataFrame `dataframe`: table to save
     dict `settings`: pairs of DataPage attribute options and their values
     '''
-    f = open(file_name, 'w')
-    if settings is not None:
-        for key, val in settings.items():
-            # ampersand (&) is comment character
-            f.write("&%s:,%s,\n" % (str(key), str(val)))
-    
-    dataframe.to_csv(f)
-    f.close()
+    directory, base_name = os.path.split(file_name)
+    temp_name = os.path.join(directory, ".tmp_" + base_name) # same extension, same compression
+    try:
+        with open_table(temp_name, 'w') as f:
+            if settings is not None:
+                for key, val in settings.items():
+                    # ampersand (&) is comment character
+                    f.write("&%s:,%s,\n" % (str(key), str(val)))
+
+            dataframe.to_csv(f)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+table_extensions = {None: ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"} # by compression
+
+def save_table(file_name, dataframe, settings=None):
+    '''
+    Saves a table with save_csv_commented, then removes any copy of the same
+    table saved with a different compression, so that only one is loaded.
+
+    Params
+    string `file_name`: file path of .csv file to write to
+    DataFrame `dataframe`: table to save
+    dict `settings`: pairs of DataPage attribute options and their values
+    '''
+    save_csv_commented(file_name, dataframe, settings)
+    base_name = file_name.split(".csv")[0]
+    for extension in table_extensions.values():
+        if base_name + extension != file_name and os.path.exists(base_name + extension):
+            os.remove(base_name + extension)
 
-def prepare():
+def prepare(compression=None, interrupted=None):
     '''
     Downloads, cleans, restructures and saves data as csv files to play
     with in the application. These files can be modified and others can be
     created in a similar format.
+    Each table is written in the background as soon as it is ready, while the
+    next one is fetched.
 
     Basically a script wrapped in a function so that the main application can
     handily provide the option of re-fetching data when it's launched.
+
+    Each download gives up after `url_timeout` seconds without a response,
+    and `interrupted` is checked before each one, so that a refresh can be
+    stopped early. Tables already handed to the writer are still saved.
+
+    Params
+    string `compression`: (optional) "gzip" or "zstd" to compress the tables
+    function `interrupted`: (optional) returns True when the refresh should stop
+
+    Returns
+    bool: True if every table was saved, False if the refresh was stopped
     '''
+    def stopping():
+        return interrupted is not None and interrupted()
+
+    extension = table_extensions[compression]
+    writer = ThreadPoolExecutor(max_workers=4)
+    saves = []
+
     ##### Testing and populations accessed from https://covidtracking.com/
 
     total_tests_frame = pd.DataFrame()
@@ -93,6 +263,9 @@ def prepare():
     abbrs = [abbr.strip() for abbr in abbrs_file.readlines()]
 
     for name, abbr in zip(names, abbrs):
+        if stopping():
+            writer.shutdown()
+            return False
         total_tests_frame, pos_ratios_frame = add_state(total_tests_frame, pos_ratios_frame, name, abbr)
     
     total_tests_frame = total_tests_frame.sort_index(axis='index')
@@ -101,16 +274,20 @@ def prepare():
 
     total_tests_settings = {"ylabel": "Tests", "delta_allowed": True, "per_capita_allowed": True}
 
-    save_csv_commented("tables/Tests_US.csv", total_tests_frame, total_tests_settings)
+    saves.append(writer.submit(save_table, "tables/Tests_US" + extension, total_tests_frame, total_tests_settings))
 
-    save_csv_commented("tables/Positivity_Ratio_US.csv", pos_ratios_frame, {"ylabel": "Fraction of total tests 'positive'"})
+    saves.append(writer.submit(save_table, "tables/Positivity_Ratio_US" + extension, pos_ratios_frame, {"ylabel": "Fraction of total tests 'positive'"}))
 
     
     ##### Confirmed cases accessed from https://github.com/CSSEGISandData/COVID-19
     
     confirmed_time_series_url = "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_US.csv"
 
-    confirmed_time_series = pd.read_csv(confirmed_time_series_url, header=0, index_col=6)
+    if stopping():
+        writer.shutdown()
+        return False
+
+    confirmed_time_series = read_url_csv(confirmed_time_series_url, header=0, index_col=6)
 
     confirmed_time_series = confirmed_time_series.drop(labels=["Diamond Princess", "Grand Princess"], axis=0)
 
@@ -124,14 +301,18 @@ def prepare():
 
     confirmed_settings = {"ylabel": "Cases", "log_allowed": True, "delta_allowed": True, "per_capita_allowed": True, "suggested_scaling": 1000000}
     
-    save_csv_commented("tables/Confirmed_US.csv", confirmed_time_series, confirmed_settings)
+    saves.append(writer.submit(save_table, "tables/Confirmed_US" + extension, confirmed_time_series, confirmed_settings))
 
 
     ##### Deaths accessed from https://github.com/CSSEGISandData/COVID-19
 
     deaths_time_series_url = "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_deaths_US.csv"
 
-    deaths_time_series = pd.read_csv(deaths_time_series_url, header=0, index_col=6)
+    if stopping():
+        writer.shutdown()
+        return False
+
+    deaths_time_series = read_url_csv(deaths_time_series_url, header=0, index_col=6)
 
     deaths_time_series = deaths_time_series.drop(labels=["Diamond Princess", "Grand Princess"], axis=0)
 
@@ -151,8 +332,15 @@ def prepare():
 
     deaths_settings = {"ylabel": "Deaths", "log_allowed": True, "delta_allowed": True, "per_capita_allowed": True, "suggested_scaling": 1000000}
 
-    save_csv_commented("tables/Deaths_US.csv", deaths_time_series, deaths_settings)
+    saves.append(writer.submit(save_table, "tables/Deaths_US" + extension, deaths_time_series, deaths_settings))
+
+    for save in saves:
+        save.result() # wait for all tables, re-raising any write errors
+    writer.shutdown()
+    return True
 
 
 if __name__ == "__main__":
-    prepare()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download and save the newest data tables.")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], help="compress the saved tables")
+    prepare(parser.parse_args().compression)
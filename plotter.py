@@ -1,12 +1,20 @@
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib import animation
+from matplotlib.collections import LineCollection
 from matplotlib.ticker import FuncFormatter
 from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+import multiprocessing
+import numpy as np
 import pandas as pd
 import os
-import warnings
-
-warnings.filterwarnings("ignore", lineno=114) # this is dirt cheap and I know it
+import pickle
+import subprocess
+import tempfile
+from data_prep import open_table
 
 
 class DataPage():
@@ -23,6 +31,8 @@ class DataPage():
         self.per_capita_allowed = per_capita_allowed
         self.delta_allowed = delta_allowed
         self.suggested_scaling = suggested_scaling
+        self.summary = summarize(self.data)
+        self.cube_index = None # position of this page in its handler's cube
 
     def set_handler(self, handler):
         '''
@@ -35,10 +45,66 @@ class DataPage():
         '''
         self.handler = handler
 
+    def set_data(self, data):
+        '''
+        Replaces this page's table, keeping its settings and figure. Used to
+        swap in refreshed data while the page is displayed.
+
+        Params
+        DataFrame `data`: new date-indexed table of data
+        '''
+        self.data = data
+        self.headers = set(self.data.columns)
+        self.summary = summarize(self.data)
+
+    def append_data(self, new_rows):
+        '''
+        Adds rows of data for dates after the last date this page has data
+        for, and updates the summary from only the new rows and the week
+        before them.
+
+        Params
+        DataFrame `new_rows`: date-indexed rows with the same columns as the table
+        '''
+        if len(new_rows.index) == 0:
+            return
+        # drop any empty padding rows (see DataHandler.build_cube) that the new rows replace
+        self.data = pd.concat([self.data[self.data.index < new_rows.index[0]], new_rows])
+        self.headers |= set(new_rows.columns)
+
+        # the table may be padded with other pages' locations, so only summarize this page's
+        own_columns = [h for h in self.data.columns if h in self.headers]
+        tail = summarize(self.data.iloc[-(len(new_rows.index) + 7):][own_columns])
+        summary = self.summary.reindex(tail.index)
+
+        # a larger peak in the new rows replaces the old one
+        new_peak = tail["peak"].notna() & ~(summary["peak"] >= tail["peak"])
+        summary.loc[new_peak, ["peak", "peak_date"]] = tail.loc[new_peak, ["peak", "peak_date"]]
+
+        # other stats change only where the new rows have a value
+        has_new = new_rows.reindex(columns=tail.index).notna().any(axis="index")
+        recent = ["latest", "growth", "per_capita", "weekly_per_capita"]
+        summary.loc[has_new, recent] = tail.loc[has_new, recent]
+        self.summary = summary
+
+    def rank_locations(self, column):
+        '''
+        Lists this page's locations from highest to lowest value of a summary
+        column. Locations with no value are listed last.
+
+        Params
+        string `column`: summary column to rank by (see summarize)
+
+        Returns
+        string list: location names in ranked order
+        '''
+        return list(self.summary[column].sort_values(ascending=False, na_position="last").index)
+
     def modify_columns(self, headers):
         '''
-        Filter data columns by headers, and apply any modifications selected
-        by the user to prepare for plotting.
+        Filter data columns by headers and rows by the handler's start date,
+        and apply any modifications selected by the user to prepare for
+        plotting.
         Original table data is not modified.
 
         Params
@@ -47,14 +113,29 @@ class DataPage():
         Returns
         DataFrame `selected_colmns`: modified subset of data to plot
         '''
-        selected_columns = self.data[headers]
+        dates = self.handler.dates
+        first_row = 0
+        if self.handler.start_date is not None:
+            first_row = dates.searchsorted(self.handler.start_date)
+
+        # keep enough earlier rows for the daily change and its 7-day average
+        warm_up = 0
+        if self.handler.delta and self.delta_allowed:
+            warm_up = 7
+        warm_up = min(warm_up, first_row)
+
+        # look up column positions once, then select from the handler's array
+        cols = self.handler.location_positions(headers)
+        values = self.handler.cube[self.cube_index][first_row - warm_up:, cols]
+        selected_columns = pd.DataFrame(values, index=dates[first_row - warm_up:], columns=headers)
 
         if self.handler.delta and self.delta_allowed:
             selected_columns = selected_columns.diff(axis='index')
             selected_columns = selected_columns.rolling(7, win_type="triang").mean()
+            selected_columns = selected_columns.iloc[warm_up:]
         
         if self.handler.per_capita and self.per_capita_allowed:
-            selected_columns = selected_columns.divide(state_populations_series[headers], axis="columns")
+            selected_columns = selected_columns.divide(self.handler.populations[cols], axis="columns")
             if self.suggested_scaling is not None:
                 selected_columns *= self.suggested_scaling
        
@@ -112,20 +193,45 @@ class DataPage():
         if len(selected_headers) == 0:
             self.clear_plot()
             return
-        ax = self.figure.add_subplot()
+        if len(self.figure.axes) == 0:
+            self.figure.add_subplot()
+        ax = self.figure.axes[0] # reuse the same axes rather than stacking new ones
         ax.clear()
 
         updated_columns = self.modify_columns(selected_headers)
+        highlighted = [h for h in self.handler.highlighted_headers if h in selected_headers]
 
         if self.handler.log_scale and self.log_allowed:
-            ax.semilogy(updated_columns)
+            ax.set_yscale("log")
+
+        # each location keeps the colour of its position, however it is drawn
+        colors = cycle_colors(len(updated_columns.columns))
+        highlight_lines = []
+        highlight_names = []
+        if len(selected_headers) < self.handler.bulk_threshold:
+            lines = ax.plot(updated_columns)
+            for line, header in zip(lines, updated_columns.columns):
+                if header in highlighted:
+                    line.set_linewidth(2.5)
+                    highlight_lines.append(line)
+                    highlight_names.append(header)
         else:
-            ax.plot(updated_columns)
+            # too many locations for separate lines, so draw the rest as one artist
+            is_highlighted = updated_columns.columns.isin(highlighted)
+            plot_collection(ax, updated_columns.loc[:, ~is_highlighted],
+                colors=[c for c, h in zip(colors, is_highlighted) if not h],
+                alpha=0.3 if len(highlighted) > 0 else 1)
+            for header, color, h in zip(updated_columns.columns, colors, is_highlighted):
+                if h:
+                    highlight_lines.extend(ax.plot(updated_columns[header], color=color, linewidth=2.5, zorder=3))
+                    highlight_names.append(header)
 
         self.format_plot(ax)
 
         if len(selected_headers) < 20:
             ax.legend(updated_columns.columns)
+        elif len(highlight_lines) > 0:
+            ax.legend(highlight_lines, highlight_names)
 
     def clear_plot(self):
         '''
@@ -143,6 +249,30 @@ class DataPage():
         '''
         self.figure.savefig(file_name)
 
+    def plot_snapshot(self):
+        '''
+        Re-plots the page and returns a pickled copy of its figure, so that
+        animation frames can be drawn without touching the displayed figure.
+
+        Returns
+        bytes: pickled figure
+        '''
+        self.update_plot()
+        return pickle.dumps(self.figure)
+
+    def save_animation(self, file_name, fps=10, processes=None):
+        '''
+        Saves an animation of the current plot growing day by day, from the
+        handler's start date to its max date. See export_animation.
+
+        Params
+        string `file_name`: .gif or .mp4 file path, or PNG frame file pattern
+        int `fps`: frames (days) per second of animation
+        int `processes`: (optional) number of processes for rendering frames
+        '''
+        check_animation_name(file_name)
+        export_animation(self.plot_snapshot(), file_name, fps=fps, processes=processes)
+
 
 class DataHandler():
     ''' Manages pages of similar data sets, as well as formatting options
@@ -158,6 +288,54 @@ class DataHandler():
         self.min_date = None
         self.max_date = None
         self.start_date = None
+        self.highlighted_headers = []
+        self.bulk_threshold = 20 # draw this many locations or more as one LineCollection
+        self.dates = pd.DatetimeIndex([]) # date axis shared by all pages
+        self.locations = pd.Index([]) # location axis shared by all pages
+        self.cube = np.empty((0, 0, 0)) # page x date x location values of all pages
+        self.populations = np.empty(0) # population of each location
+        self.location_index = {} # position of each location on the location axis
+
+    def build_cube(self):
+        '''
+        Lines up all pages on one date axis and one location axis, and copies
+        their tables into a single page x date x location array, padded with
+        NaN where a page has no data. Each page's table is then replaced by a
+        view into its slice of the array, so that selecting dates, locations
+        or pages is plain array indexing.
+        '''
+        dates = pd.DatetimeIndex(np.unique(np.concatenate([p.data.index.values for p in self.pages])))
+        locations = pd.Index(self.headers)
+        cube = np.full((len(self.pages), len(dates), len(locations)), np.nan)
+        for page_values, page in zip(cube, self.pages):
+            rows = dates.get_indexer(page.data.index)
+            cols = locations.get_indexer(page.data.columns)
+            page_values[np.ix_(rows, cols)] = page.data.to_numpy(dtype=float)
+
+        for cube_index, page in enumerate(self.pages):
+            page.data = pd.DataFrame(cube[cube_index], index=dates, columns=locations, copy=False)
+            page.cube_index = cube_index
+
+        self.dates = dates
+        self.locations = locations
+        self.location_index = {name: i for i, name in enumerate(locations)}
+        self.cube = cube
+        self.populations = state_populations_series.reindex(locations).to_numpy(dtype=float)
+        self.min_date = dates[0]
+        self.max_date = dates[-1]
+
+    def location_positions(self, headers):
+        '''
+        Gets the positions of locations on the shared location axis, for
+        indexing the cube and populations.
+
+        Params
+        string list `headers`: location names
+
+        Returns
+        int array: position of each location
+        '''
+        return np.array([self.location_index[h] for h in headers], dtype=int)
 
     def add_page(self, page=None, title=None, data=None, xlabel="Date", ylabel="", log_allowed=True, per_capita_allowed=True, delta_allowed=True, suggested_scaling=None):
         '''
@@ -175,29 +353,91 @@ class DataHandler():
         bool `delta_allowed`: setting to allow differential plotting
         int `suggested_scaling`: if scaled by population, displays "per ___ people"
         '''
-        if page is not None:
-            newpage = page
-            newpage.set_handler(self)
-            new_headers = newpage.headers
-        else:
-            newpage = DataPage(title, data, self, xlabel=xlabel, ylabel=ylabel, log_allowed=log_allowed, per_capita_allowed=per_capita_allowed, delta_allowed=delta_allowed, suggested_scaling=suggested_scaling)
-            new_headers = list(data.columns)
+        if page is None:
+            page = DataPage(title, data, self, xlabel=xlabel, ylabel=ylabel, log_allowed=log_allowed, per_capita_allowed=per_capita_allowed, delta_allowed=delta_allowed, suggested_scaling=suggested_scaling)
+        self.add_pages([page])
 
-        if self.min_date is not None:
-            self.min_date = min(self.min_date, page.data.index[0])
-            self.max_date = max(self.max_date, page.data.index[-1])
-        else:
-            self.min_date = page.data.index[0]
-            self.max_date = page.data.index[-1]
-        self.start_date = self.min_date
+    def add_pages(self, pages):
+        '''
+        Adds several DataPages to this DataHandler, lining them up with the
+        other pages only once, after all are added.
 
-        if newpage not in self.pages:
-            self.pages.append(newpage)
-            self.headers.extend(h for h in new_headers if h not in self.headers)
+        Params
+        DataPage list `pages`: pages to add
+        '''
+        added = False
+        for newpage in pages:
+            newpage.set_handler(self)
+            if newpage not in self.pages:
+                self.pages.append(newpage)
+                self.headers.extend(h for h in newpage.headers if h not in self.headers)
+                self.num_pages += 1
+                added = True
+        if added:
             self.headers.sort()
-            self.num_pages += 1
             self.active_headers = self.headers[:] # all selected after data loads
 
+        self.build_cube()
+        self.start_date = self.min_date
+
+    def replace_data(self, page, data):
+        '''
+        Replaces the table of one of this DataHandler's pages. See
+        replace_pages.
+
+        Params
+        DataPage `page`: page to update
+        DataFrame `data`: new date-indexed table of data
+        '''
+        self.replace_pages([(page, data)])
+
+    def replace_pages(self, replacements):
+        '''
+        Replaces the tables of several of this DataHandler's pages, keeping the
+        current selections and formatting options, and lines the pages up
+        again only once, after all are replaced. New locations are added to
+        the headers but are not selected.
+        If a new table only adds dates after its page's data, with the same
+        locations and unchanged earlier values, the new rows are appended
+        instead, so the page's summary is updated incrementally.
+
+        Params
+        (DataPage, DataFrame) list `replacements`: pages to update, each with
+            its new date-indexed table of data
+        '''
+        for page, data in replacements:
+            own_columns = [h for h in page.data.columns if h in page.headers]
+            reported = page.data[own_columns].dropna(how="all").index
+            appended = False
+            if set(data.columns) == page.headers and len(reported) > 0:
+                earlier = data[data.index <= reported[-1]]
+                previous = page.data.reindex(index=earlier.index, columns=earlier.columns)
+                if np.array_equal(earlier.to_numpy(dtype=float), previous.to_numpy(dtype=float), equal_nan=True):
+                    page.append_data(data[data.index > reported[-1]])
+                    appended = True
+            if not appended:
+                page.set_data(data)
+            self.headers.extend(h for h in data.columns if h not in self.headers)
+
+        self.headers.sort()
+        self.build_cube()
+        if self.start_date is not None:
+            self.start_date = max(self.start_date, self.min_date)
+
+    def append_data(self, page, new_rows):
+        '''
+        Adds rows of data for dates after the end of one of this
+        DataHandler's pages, and lines it up with the other pages again.
+
+        Params
+        DataPage `page`: page to extend
+        DataFrame `new_rows`: date-indexed rows of new data
+        '''
+        page.append_data(new_rows)
+        self.headers.extend(h for h in new_rows.columns if h not in self.headers)
+        self.headers.sort()
+        self.build_cube()
+
     def get_page_titles(self):
         '''
         Get all the titles of contained DataPages, for labeling tabs.
@@ -227,12 +467,291 @@ format_M = FuncFormatter(millions)
 format_K = FuncFormatter(thousands)
 
 
+def cycle_colors(count):
+    '''
+    Gets the colours that `count` lines plotted one by one on a cleared axes
+    would get. Clearing an axes resets its colour cycle to the one in
+    rcParams, so this is the cycle that update_plot's axes use.
+
+    Params
+    int `count`: number of lines
+
+    Returns
+    list: colour of each line
+    '''
+    cycle = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+    return [cycle[i % len(cycle)] for i in range(count)]
+
+def plot_collection(ax, data, colors=None, alpha=1):
+    '''
+    Plots every column of a date-indexed table as a single LineCollection,
+    which draws thousands of lines much faster than one Line2D per column.
+
+    Params
+    Axes `ax`: plot axes to draw on
+    DataFrame `data`: table with dates as rows and one column per line
+    list `colors`: (optional) colour of each line; by default, the colours
+        they would get from the axes' colour cycle (see cycle_colors)
+    float `alpha`: opacity of the lines
+    '''
+    x = mdates.date2num(data.index)
+    segments = np.empty((len(data.columns), len(x), 2))
+    segments[:, :, 0] = x
+    segments[:, :, 1] = data.to_numpy(dtype=float).T
+    if colors is None:
+        colors = cycle_colors(len(data.columns))
+    ax.xaxis_date()
+    ax.add_collection(LineCollection(segments, colors=colors, alpha=alpha))
+    ax.autoscale_view()
+
+def plotted_lines(ax):
+    '''
+    Gets the line artists of a plot: single lines and LineCollections.
+
+    Params
+    Axes `ax`: plot axes
+
+    Returns
+    list: Line2D and LineCollection artists
+    '''
+    return ax.get_lines() + [c for c in ax.collections if isinstance(c, LineCollection)]
+
+def line_data(line):
+    '''
+    Gets the complete data of a line artist, in the form used by extend_lines.
+    x values are matplotlib date numbers.
+
+    Params
+    Line2D or LineCollection `line`: plotted line(s)
+
+    Returns
+    (x, y) arrays for a Line2D, or a list of (n, 2) segment arrays for a
+    LineCollection
+    '''
+    if isinstance(line, LineCollection):
+        # segments of only missing values come back empty and flat
+        return [segment.reshape(-1, 2) for segment in line.get_segments()]
+    return (mdates.date2num(line.get_xdata()), line.get_ydata())
+
+def frame_dates(full_data):
+    '''
+    Gets every date plotted by any line, as the dates to end animation
+    frames on. LineCollections drop missing values from their segments, so
+    frames are matched to lines by date rather than by row.
+
+    Params
+    list `full_data`: complete data of each line, from line_data
+
+    Returns
+    float array: sorted date numbers
+    '''
+    x_values = []
+    for data in full_data:
+        if isinstance(data, tuple):
+            x_values.append(data[0])
+        else:
+            x_values.extend(segment[:, 0] for segment in data)
+    if len(x_values) == 0:
+        return np.empty(0)
+    return np.unique(np.concatenate(x_values))
+
+def extend_lines(lines, full_data, end):
+    '''
+    Sets each line to show its data up to and including the date `end`.
+    Used to grow an existing plot frame by frame without re-plotting it.
+
+    Params
+    list `lines`: plotted Line2D and LineCollection artists to update
+    list `full_data`: complete data of each line, from line_data
+    float `end`: last date number to show, or None for all data
+    '''
+    for line, data in zip(lines, full_data):
+        if isinstance(line, LineCollection):
+            line.set_segments([segment if end is None else segment[:segment[:, 0].searchsorted(end, side="right")] for segment in data])
+        else:
+            x, y = data
+            stop = None if end is None else x.searchsorted(end, side="right")
+            line.set_data(x[:stop], y[:stop])
+
+def save_frames(figure_data, frames, file_pattern, palette=False):
+    '''
+    Saves numbered animation frames of a plotted figure to PNG files.
+    Run in a worker process by export_animation, on its own copy of the
+    figure with complete lines already plotted.
+
+    Params
+    bytes `figure_data`: pickled figure with one axes of plotted lines
+    list `frames`: (frame number, last date number to show) pairs
+    string `file_pattern`: file path with a %d-style field for frame number
+    bool `palette`: reduce frames to 256 colours, as needed for a .gif
+    '''
+    figure = pickle.loads(figure_data)
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.axes[0]
+    lines = plotted_lines(ax)
+    full_data = [line_data(line) for line in lines]
+
+    # axes, ticks and labels stay the same in every frame, so draw them once
+    # and only draw the lines (and the legend over them) onto each frame
+    overlays = sorted(lines, key=lambda artist: artist.get_zorder())
+    if ax.get_legend() is not None:
+        overlays.append(ax.get_legend())
+    for artist in overlays:
+        artist.set_visible(False)
+    canvas.draw()
+    background = canvas.copy_from_bbox(figure.bbox)
+    for artist in overlays:
+        artist.set_visible(True)
+
+    for frame_num, end in frames:
+        extend_lines(lines, full_data, end)
+        canvas.restore_region(background)
+        for artist in overlays:
+            ax.draw_artist(artist)
+        image = Image.fromarray(np.asarray(canvas.buffer_rgba()))
+        if palette:
+            image = image.convert("RGB").quantize(method=Image.Quantize.FASTOCTREE)
+        image.save(file_pattern % frame_num, compress_level=1)
+
+def check_animation_name(file_name):
+    '''
+    Checks that an animation can be saved to the given file name before any
+    frames are drawn.
+
+    Params
+    string `file_name`: .gif or .mp4 file path, or PNG frame file pattern
+
+    Raises
+    RuntimeError: if saving .mp4 files but ffmpeg is not available
+    ValueError: if a frame file pattern has no single %d-style field
+    '''
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == ".gif":
+        return
+    elif extension == ".mp4":
+        if not animation.writers.is_available("ffmpeg"):
+            raise RuntimeError("ffmpeg is needed to save .mp4 animations, but it was not found")
+        return
+    try:
+        numbered = (file_name % 0) != (file_name % 1)
+    except (TypeError, ValueError):
+        numbered = False
+    if not numbered:
+        raise ValueError("Frame file name needs one %%d-style field for the frame number: %s" % file_name)
+
+def export_animation(figure_data, file_name, fps=10, processes=None):
+    '''
+    Saves an animation of a plotted figure growing day by day. Lines are
+    plotted once, and each frame only extends the existing lines to the
+    next row. Frames are drawn across several processes, each on its own
+    copy of the figure, so this does not touch any displayed figure and can
+    run on a background thread.
+    .gif files are assembled from the frames with Pillow and .mp4 files with
+    ffmpeg. Any other file name is used as a numbered pattern for a sequence
+    of PNG frames (e.g. "frames/cases_%04d.png").
+
+    Params
+    bytes `figure_data`: pickled figure, from DataPage.plot_snapshot
+    string `file_name`: .gif or .mp4 file path, or PNG frame file pattern
+    int `fps`: frames (days) per second of animation
+    int `processes`: (optional) number of processes for rendering frames
+    '''
+    check_animation_name(file_name)
+    figure = pickle.loads(figure_data)
+    if len(figure.axes) == 0:
+        raise ValueError("Nothing is plotted to animate")
+    # one frame per plotted day, starting from the start date
+    full_data = [line_data(line) for line in plotted_lines(figure.axes[0])]
+    frames = list(enumerate(frame_dates(full_data)))
+    if len(frames) == 0:
+        raise ValueError("Nothing is plotted to animate")
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(frames)))
+    extension = os.path.splitext(file_name)[1].lower()
+    with tempfile.TemporaryDirectory() as frame_dir:
+        pattern = file_name
+        if extension in (".gif", ".mp4"):
+            pattern = os.path.join(frame_dir, "frame_%05d.png")
+
+        palette = extension == ".gif"
+        if processes == 1:
+            save_frames(figure_data, frames, pattern, palette)
+        else:
+            chunks = [frames[i::processes] for i in range(processes)]
+            # spawn rather than fork, since the GUI process has other threads running
+            with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+                list(pool.map(save_frames, [figure_data] * processes, chunks, [pattern] * processes, [palette] * processes))
+
+        if extension == ".gif":
+            images = [Image.open(pattern % frame_num) for frame_num, _ in frames]
+            images[0].save(file_name, save_all=True, append_images=images[1:], duration=1000 / fps, loop=0)
+        elif extension == ".mp4":
+            subprocess.run([animation.FFMpegWriter.bin_path(), "-y", "-loglevel", "error",
+                "-framerate", str(fps), "-i", pattern,
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", file_name], check=True)
+
+
+def summarize(data):
+    '''
+    Computes summary statistics for every column of a date-indexed table in
+    one pass over its values, for ranking and filtering locations.
+
+    Params
+    DataFrame `data`: table with locations as columns and dates as rows
+
+    Returns
+    DataFrame: one row per location, with columns
+        "latest": last reported value
+        "peak", "peak_date": highest value and the date it was reached
+        "growth": relative change over the 7 rows up to the latest value
+        "per_capita": latest value divided by population
+        "weekly_per_capita": change over the 7 rows up to the latest value,
+            divided by population
+    '''
+    values = data.to_numpy(dtype=float)
+    dates = data.index
+    if len(values) == 0:
+        # a single missing row, so every statistic is missing
+        values = np.full((1, len(data.columns)), np.nan)
+        dates = pd.DatetimeIndex([pd.NaT])
+    cols = np.arange(values.shape[1])
+    has_value = ~np.isnan(values)
+    any_value = has_value.any(axis=0)
+
+    # row of the last non-missing value in each column
+    last_row = len(values) - 1 - has_value[::-1].argmax(axis=0)
+    latest = np.where(any_value, values[last_row, cols], np.nan)
+
+    peak_row = np.where(has_value, values, -np.inf).argmax(axis=0)
+    peak = np.where(any_value, values[peak_row, cols], np.nan)
+    peak_date = dates[peak_row].where(any_value)
+
+    week_row = last_row - 7
+    week_ago = np.where(week_row >= 0, values[np.maximum(week_row, 0), cols], np.nan)
+    change = latest - week_ago
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(week_ago > 0, change / week_ago, np.nan)
+
+    populations = state_populations_series.reindex(data.columns).to_numpy(dtype=float)
+
+    return pd.DataFrame({
+        "latest": latest,
+        "peak": peak,
+        "peak_date": peak_date,
+        "growth": growth,
+        "per_capita": latest / populations,
+        "weekly_per_capita": change / populations,
+    }, index=data.columns)
+
 def page_from_csv(file_name):
     '''
     Reads a csv file to create a DataPage object. The file should be indexed
     by dates, and any comments or DataPage options should be specified at the
     top of the file using the format "&attr_name:,attr_value," creating a row
     of 2 cells for each attribute.
+    Files compressed with gzip (.gz) or zstd (.zst) are read transparently.
     The resulting DataPage will have no DataHandler and will need to have it
     set using set_handler in order to plot.
 
@@ -246,7 +765,7 @@ def page_from_csv(file_name):
     title = os.path.basename(file_name).split('.')[0].replace('_', ' ')
     log, delta, per_capita= False, False, False
     ylabel, scaling = None, None
-    f = open(file_name)
+    f = open_table(file_name)
     line = f.readline()
     while line[0] == '&':
         key, val = line.split(',')[:2]
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import plotter
+
+
+def confirmed_table():
+    return plotter.page_from_csv("tables/Confirmed_US.csv").data.astype(float)
+
+def assert_same_summary(summary, expected):
+    pd.testing.assert_frame_equal(summary.sort_index(), expected.sort_index(), check_dtype=False)
+
+def test_append_matches_full_summary():
+    data = confirmed_table()
+    page = plotter.DataPage("Confirmed", data.iloc[:100], None)
+    page.append_data(data.iloc[100:])
+    assert_same_summary(page.summary, plotter.summarize(data))
+
+def test_append_keeps_peak_of_location_missing_from_new_rows():
+    data = confirmed_table()
+    data.loc["2020-03-16":, "Alaska"] = np.nan
+    page = plotter.DataPage("Confirmed", data.loc[:"2020-03-30"], None)
+    page.append_data(data.loc["2020-03-31":"2020-03-31"])
+    assert_same_summary(page.summary, plotter.summarize(data.loc[:"2020-03-31"]))
+    assert page.summary.loc["Alaska", "peak"] == data["Alaska"].max()
+
+def spy_on_refresh(monkeypatch):
+    calls = []
+    append_data, set_data = plotter.DataPage.append_data, plotter.DataPage.set_data
+    def spy_append(page, new_rows):
+        calls.append(("append", new_rows.index))
+        append_data(page, new_rows)
+    def spy_set(page, data):
+        calls.append(("set", data.index))
+        set_data(page, data)
+    monkeypatch.setattr(plotter.DataPage, "append_data", spy_append)
+    monkeypatch.setattr(plotter.DataPage, "set_data", spy_set)
+    return calls
+
+def test_refresh_with_new_dates_appends(monkeypatch):
+    data = confirmed_table()
+    handler = plotter.DataHandler()
+    page = plotter.DataPage("Confirmed", data.iloc[:100], None)
+    handler.add_page(page)
+    calls = spy_on_refresh(monkeypatch)
+    handler.replace_data(page, data)
+    assert [kind for kind, _ in calls] == ["append"]
+    pd.testing.assert_index_equal(calls[0][1], data.index[100:], check_names=False)
+    assert_same_summary(page.summary, plotter.summarize(data))
+    pd.testing.assert_frame_equal(page.data, data, check_freq=False, check_names=False)
+
+def test_refresh_with_changed_history_recomputes(monkeypatch):
+    data = confirmed_table()
+    handler = plotter.DataHandler()
+    page = plotter.DataPage("Confirmed", data.iloc[:100], None)
+    handler.add_page(page)
+    calls = spy_on_refresh(monkeypatch)
+    revised = data.copy()
+    revised.iloc[50, 0] += 1
+    handler.replace_data(page, revised)
+    assert [kind for kind, _ in calls] == ["set"]
+    assert_same_summary(page.summary, plotter.summarize(revised))
+
+def test_pages_are_views_of_cube_and_scale_by_position():
+    handler = plotter.DataHandler()
+    confirmed = plotter.page_from_csv("tables/Confirmed_US.csv")
+    tests = plotter.page_from_csv("tables/Tests_US.csv")
+    original = confirmed.data.astype(float)
+    handler.add_pages([confirmed, tests])
+    for page in handler.pages:
+        assert np.shares_memory(page.data.to_numpy(), handler.cube)
+
+    handler.per_capita = True
+    headers = ["New York", "Alabama"]
+    expected = original[headers].divide(plotter.state_populations_series[headers]) * confirmed.suggested_scaling
+    scaled = confirmed.modify_columns(headers)
+    pd.testing.assert_frame_equal(scaled, expected.reindex(scaled.index), check_freq=False, check_names=False)
+
+def test_replace_pages_builds_cube_once(monkeypatch):
+    confirmed = confirmed_table()
+    tests = plotter.page_from_csv("tables/Tests_US.csv").data.astype(float)
+    handler = plotter.DataHandler()
+    pages = [plotter.DataPage("Confirmed", confirmed.iloc[:100], None), plotter.DataPage("Tests", tests.iloc[:100], None)]
+    handler.add_pages(pages)
+    builds = []
+    build_cube = plotter.DataHandler.build_cube
+    def spy_build(handler):
+        builds.append(handler)
+        build_cube(handler)
+    monkeypatch.setattr(plotter.DataHandler, "build_cube", spy_build)
+    handler.replace_pages([(pages[0], confirmed), (pages[1], tests)])
+    assert len(builds) == 1
+    for page, data in zip(pages, (confirmed, tests)):
+        assert np.shares_memory(page.data.to_numpy(), handler.cube)
+        assert_same_summary(page.summary, plotter.summarize(data))